@@ -1,76 +1,84 @@
-import codecs
 import math
 import os
-from typing import Iterator, Dict, List, cast
-from uuid import uuid4
+from itertools import chain
+from typing import Iterable, Iterator, List, NamedTuple, cast
 
-from utils.argparser import args
+from utils.argparser import options
 from utils.encrypt import encrypt
+from utils.rename_batch import Rename, rename_batch
 
 EXCLUDED_FILES: list[str] = []
 
 # change here, example : png, jpg, ...
 ALLOWED_SUFFIX: tuple[str, ...] = ()
 
+
+class FileInfo(NamedTuple):
+    root: str  # full path of the file or folder
+    name: str  # file or folder name
+    mtime: str  # encoded modified time
+    is_dir: bool
+
+
 # Define a type alias for the files type
-FILE_INFOS = List[Dict[str, str | bool]]
+FILE_INFOS = List[FileInfo]
 
 
-def get_files(
+def iter_files(
     dir_path: str,
     order_by_timestamp: bool = False,
     recursive: bool = False,
-) -> FILE_INFOS:
+) -> Iterator[FileInfo]:
     """
-    Get a list of files and directories in the given directory path.
+    Iterate over the files and directories in the given directory path.
+
+    Each directory is fully listed before its entries are yielded, so the
+    entries can be renamed while the iteration goes on.
 
     Args:
         dir_path (str): The directory path to scan.
         order_by_timestamp (bool): Order files by timestamp if True.
         recursive (bool): Recursively scan subdirectories if True.
 
-    Returns:
-        List[Dict[str, str | bool]]: A list of file information.
+    Yields:
+        FileInfo: The information of each file.
 
     """
-    # Get the list of files and directories in the given directory path
-    dirs: Iterator[os.DirEntry[str]] = os.scandir(dir_path)
+    # Directories that still need to be scanned (walked iteratively)
+    pending_dirs: List[str] = [dir_path]
 
-    # Sort the files by modification time in descending order
-    if order_by_timestamp:
-        dirs = sorted(dirs, key=lambda entry: entry.stat().st_mtime, reverse=True)
+    while pending_dirs:
+        current_dir: str = pending_dirs.pop()
 
-    files: FILE_INFOS = []
+        # Get the list of files and directories in the current directory
+        with os.scandir(current_dir) as entries:
+            dirs: List[os.DirEntry[str]] = list(entries)
 
-    for file in dirs:
-        is_directory: bool = file.is_dir()
+        # Sort the files by modification time in descending order
+        if order_by_timestamp:
+            dirs.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
 
-        # Skip excluded directories
-        if is_directory and file.name in EXCLUDED_FILES:
-            continue
+        for file in dirs:
+            is_directory: bool = file.is_dir()
 
-        # If it's a directory and recursive is True, scan the subdirectory
-        if is_directory and recursive:
-            # Add encoded file into the array (used for renaming)
-            encoded_file = encode_file(file)
-            files.append(encoded_file)
+            # Skip excluded directories
+            if is_directory and file.name in EXCLUDED_FILES:
+                continue
 
-            # Recursive call to scan the subdirectory
-            files += get_files(
-                dir_path=file.path,
-                order_by_timestamp=order_by_timestamp,
-                recursive=recursive,
-            )
+            # If it's a directory and recursive is True, scan the subdirectory
+            if is_directory and recursive:
+                # Yield the encoded directory (used for renaming)
+                yield encode_file(file, file.stat(), is_directory)
 
-        # Check if the file has an allowed suffix
-        if not file.name.endswith(ALLOWED_SUFFIX):
-            continue
+                # Scan the subdirectory later instead of recursing into it
+                pending_dirs.append(file.path)
 
-        # Add encoded file information to the list
-        encoded_file = encode_file(file)
-        files.append(encoded_file)
+            # Check if the file has an allowed suffix
+            if not file.name.endswith(ALLOWED_SUFFIX):
+                continue
 
-    return separate_file_and_directory(files)
+            # Yield the encoded file information
+            yield encode_file(file, file.stat(), is_directory)
 
 
 def sort_by_filename(file: os.DirEntry[str]) -> str:
@@ -81,143 +89,172 @@ def sort_by_filename(file: os.DirEntry[str]) -> str:
     return file.name.split(".")[0]
 
 
-def separate_file_and_directory(files: FILE_INFOS) -> FILE_INFOS:
+def encode_file(file: os.DirEntry[str], st: os.stat_result, is_dir: bool) -> FileInfo:
     """
-    Separate files and directories from a list of file information.
+    Encode file information.
 
     Args:
-        files (FILE_INFOS): A list of file information.
+        file (os.DirEntry[str]): A directory entry representing a file.
+        st (os.stat_result): The stat result already fetched for the entry.
+        is_dir (bool): Whether the entry is a directory.
 
     Returns:
-        FILE_INFOS: A list of files followed by directories.
+        FileInfo: Encoded file information.
 
     """
-    files_list = []
-    dirs_list = []
+    return FileInfo(file.path, file.name, encode_mtime(st.st_mtime), is_dir)
 
-    # Separate files and directories
-    for file_info in files:
-        if file_info.get("is_dir"):
-            dirs_list.append(file_info)
-        else:
-            files_list.append(file_info)
 
-    # Sort directories by length of 'root' (if it exists)
-    dirs_list.sort(key=lambda d: len(d.get("root", "")), reverse=True)
-
-    # Return files followed by directories
-    return files_list + dirs_list
-
-
-def encode_file(file: os.DirEntry[str]) -> Dict[str, str | bool]:
+def encode_mtime(st_mtime: float) -> str:
     """
-    Encode file information.
+    Encode the modified time of a file.
 
     Args:
-        file_entry (os.DirEntry[str]): A directory entry representing a file.
+        st_mtime (float): The modified time taken from the file stat.
 
     Returns:
-        Dict[str, str | bool]: Encoded file information.
+        str: The encoded modified time.
 
     """
-    file_info: Dict[str, str | bool] = {}
-
     # the date need to be rounded since it will be used as part
     # for the naming file (modified date)
-    mdate: int = math.ceil(file.stat().st_mtime)
-    # encode the modified date to hexadecimal
-    encoded_mdate = codecs.encode(str(mdate)).hex()
-
-    file_info["root"] = file.path
-    file_info["name"] = file.name
-    file_info["mtime"] = encoded_mdate
-    file_info["is_dir"] = file.is_dir()
+    mdate: int = math.ceil(st_mtime)
 
-    return file_info
+    # encode the modified date to hexadecimal
+    return "%x" % mdate
 
 
-def change_file_names(
-    files: List[Dict[str, str | bool]],
+def build_filename(
+    file: FileInfo,
     hash_directory_name: bool = False,
     use_index_filename: bool = False,
-) -> None:
-    for file in files:
-        is_file_dir = file.get("is_dir")
+) -> str:
+    """
+    Build the encrypted (mounted) name of a file or folder.
 
-        mtime = str(file.get("mtime", ""))  # modified time
-        fname = str(file.get("name", ""))  # file or folder name
+    Args:
+        file (FileInfo): The file information.
+        hash_directory_name (bool): Encrypt the folder name if True.
+        use_index_filename (bool): Encrypt the filename if True.
 
-        # if the file is directory set the extension to "folder"
-        extension: str = fname.split(".").pop().lower() if not is_file_dir else "folder"
+    Returns:
+        str: The new name, without the parent directory.
 
-        key: list[str] = str(uuid4()).split("-")
-        # extracts the second, third, and fourth segments
-        # (the segments that correspond to the version number and the variant bits, which are fixed)
-        key_segment: str = "-".join(key[1:4])
+    """
+    is_file_dir: bool = file.is_dir
+    mtime: str = file.mtime  # modified time
+    fname: str = file.name  # file or folder name
+
+    # if the file is directory set the extension to "folder"
+    extension: str = (
+        os.path.splitext(fname)[1].lstrip(".").lower()
+        if not is_file_dir
+        else "folder"
+    )
 
-        hashed_extension: str = encrypt(key_segment, extension)
-        # the key are hashed so it need more work to decrypt the extension name,
-        # it need to get the decrypted (unhashed) key.
-        hashed_key: str = encrypt(mtime, key_segment)
-        hashed_mtime: str = encrypt(hashed_extension, mtime)
+    # random key shaped like the middle segments of an uuid (xxxx-xxxx-xxxx)
+    key: str = os.urandom(6).hex()
+    key_segment: str = f"{key[:4]}-{key[4:8]}-{key[8:]}"
 
-        # the additional name can be the "original root name" or "file number"
-        additional_name: str = ""
+    hashed_extension: str = encrypt(key_segment, extension)
+    # the key are hashed so it need more work to decrypt the extension name,
+    # it need to get the decrypted (unhashed) key.
+    hashed_key: str = encrypt(mtime, key_segment)
+    hashed_mtime: str = encrypt(hashed_extension, mtime)
 
-        if not is_file_dir and use_index_filename:
-            _nm = fname.split(".")[0]  # get the filename without the extension
+    # the additional name can be the "original root name" or "file number"
+    additional_name: str = ""
 
-            additional_name = "-" + encrypt(key_segment, _nm)
+    if not is_file_dir and use_index_filename:
+        _nm = os.path.splitext(fname)[0]  # get the filename without the extension
 
-        if is_file_dir and hash_directory_name:
-            additional_name = "-" + encrypt(key_segment, fname)
+        additional_name = "-" + encrypt(key_segment, _nm)
 
-        filename = "{modified_time}-{extension}-{key}{additional_name}".format(
-            modified_time=hashed_mtime,
-            extension=hashed_extension,
-            key=hashed_key,
-            additional_name=additional_name,
-        )
+    if is_file_dir and hash_directory_name:
+        additional_name = "-" + encrypt(key_segment, fname)
 
-        # get root directory name without the file
-        # example: c:\aa\bb\cc\dd.extension => c:\aa\bb\cc\
-        directory: list[str] = str(file.get("root", "")).split("\\")[:-1]
-        directory_root: str = "\\".join(directory)
+    return f"{hashed_mtime}-{hashed_extension}-{hashed_key}{additional_name}"
 
-        old_filename: str = str(file.get("root", ""))
-        new_filename: str = f"{directory_root}\\{filename}"
 
-        os.rename(old_filename, new_filename)
+def build_rename(
+    file: FileInfo,
+    hash_directory_name: bool = False,
+    use_index_filename: bool = False,
+) -> Rename:
+    """
+    Build the rename of a file or folder to its encrypted (mounted) name.
+
+    Args:
+        file (FileInfo): The file information.
+        hash_directory_name (bool): Encrypt the folder name if True.
+        use_index_filename (bool): Encrypt the filename if True.
 
+    Returns:
+        Rename: The rename from the old path to the new path.
 
-def setup() -> List[str | bool | Dict[str, str | bool]]:
+    """
+    filename: str = build_filename(file, hash_directory_name, use_index_filename)
+
+    # get root directory name without the file
+    # example: c:\aa\bb\cc\dd.extension => c:\aa\bb\cc
+    new_filename: str = os.path.join(os.path.dirname(file.root), filename)
+
+    return Rename(file.root, new_filename)
+
+
+def change_file_names(
+    files: Iterable[FileInfo],
+    hash_directory_name: bool = False,
+    use_index_filename: bool = False,
+) -> None:
+    # directories are renamed after their content, so they are kept aside
+    dirs_buffer: FILE_INFOS = []
+
+    def file_renames() -> Iterator[Rename]:
+        for file in files:
+            if file.is_dir:
+                dirs_buffer.append(file)
+            else:
+                yield build_rename(file, hash_directory_name, use_index_filename)
+
+    # files do not depend on each other, each directory content is renamed
+    # in parallel while the next directories are still being scanned
+    rename_batch(file_renames(), max_workers=os.cpu_count() or 1)
+
+    # then the directories one by one (deepest first)
+    dirs_buffer.sort(key=lambda d: len(d.root), reverse=True)
+
+    rename_batch(
+        build_rename(directory, hash_directory_name, use_index_filename)
+        for directory in dirs_buffer
+    )
+
+
+def setup() -> List[str | bool | FileInfo]:
     global EXCLUDED_FILES, ALLOWED_SUFFIX
 
-    if args.exclude:
-        EXCLUDED_FILES = args.exclude
+    if options.exclude:
+        EXCLUDED_FILES = list(options.exclude)
 
-    if args.include:
-        ALLOWED_SUFFIX = tuple(list(ALLOWED_SUFFIX) + args.include)
+    if options.include:
+        ALLOWED_SUFFIX = ALLOWED_SUFFIX + options.include
 
-    root_directory: str = args.directory
+    root_directory: str = options.directory
 
-    hash_directory_name: bool = args.hash
-    sort_by_timestamp: bool = args.sort
-    use_index_filename: bool = args.use_index
-    recursive_directory: bool = args.recursive
+    hash_directory_name: bool = options.hash
+    sort_by_timestamp: bool = options.sort
+    use_index_filename: bool = options.use_index
+    recursive_directory: bool = options.recursive
 
     # get the root parent directory to be hashed
+    encoded_mdate: str = encode_mtime(os.stat(root_directory).st_mtime)
 
-    mdate: int = math.ceil(os.stat(root_directory).st_mtime)
-    # encode the modified date to hexadecimal
-    encoded_mdate = codecs.encode(str(mdate)).hex()
-
-    root_dir: Dict[str, str | bool] = {
-        "root": root_directory,
-        "name": root_directory.split("\\")[-1],
-        "mtime": encoded_mdate,
-        "is_dir": True,
-    }
+    root_dir = FileInfo(
+        root=root_directory,
+        name=os.path.basename(root_directory),
+        mtime=encoded_mdate,
+        is_dir=True,
+    )
 
     return [
         root_directory,
@@ -245,14 +282,16 @@ if __name__ == "__main__":
         root_dir,
     ) = setup()
 
-    files: FILE_INFOS = get_files(
-        cast(str, root_directory),
-        cast(bool, order_by_timestamp),
-        cast(bool, recursive_directory),
+    # the root directory is renamed last, with the other directories
+    files: Iterable[FileInfo] = chain(
+        iter_files(
+            cast(str, root_directory),
+            cast(bool, order_by_timestamp),
+            cast(bool, recursive_directory),
+        ),
+        [cast(FileInfo, root_dir)],
     )
 
-    files.append(cast(Dict[str, str | bool], root_dir))
-
     change_file_names(
         files, cast(bool, hash_directory_name), cast(bool, use_index_filename)
     )
@@ -1,12 +1,11 @@
 import os
-from datetime import datetime
-from typing import Iterator, List, Tuple, cast
+from functools import partial
+from typing import Iterable, Iterator, List, Tuple, cast
 from uuid import uuid4
 
-import filedate
-
 from utils.decrypt import decrypt
-from utils.argparser import args
+from utils.argparser import options
+from utils.rename_batch import Rename, rename_batch
 
 EXCLUDED_FILES: list[str] = []
 
@@ -17,66 +16,44 @@ ALLOWED_SUFFIX: tuple[str, ...] = ()
 FILE_INFOS = List[os.DirEntry[str]]
 
 
-def get_files(dir_path: str, recursive: bool = False) -> FILE_INFOS:
+def iter_files(dir_path: str, recursive: bool = False) -> Iterator[os.DirEntry[str]]:
     """
-    Get a list of files and directories in the given directory path.
+    Iterate over the files and directories in the given directory path.
+
+    Each directory is fully listed before its entries are yielded, so the
+    entries can be renamed while the iteration goes on.
 
     Args:
         dir_path (str): The directory path to scan.
         recursive (bool): Recursively scan subdirectories if True.
 
-    Returns:
-        List[os.DirEntry[str]]: A list of file.
-
-    """
-    # Get the list of files and directories in the given directory path
-    dirs: Iterator[os.DirEntry[str]] = os.scandir(dir_path)
-
-    files: FILE_INFOS = []
-
-    for file in dirs:
-        is_directory: bool = file.is_dir()
-
-        # Skip excluded directories
-        if is_directory and file.name in EXCLUDED_FILES:
-            continue
-
-        # If it's a directory and recursive is True, scan the subdirectory
-        if is_directory and recursive:
-            # Recursive call to scan the subdirectory
-            files += get_files(dir_path=file.path, recursive=recursive)
-
-        files.append(file)
-
-    return files
+    Yields:
+        os.DirEntry[str]: Each file.
 
-
-def separate_file_and_directory(files: FILE_INFOS) -> FILE_INFOS:
     """
-    Separate files and directories from a list of file information.
+    # Directories that still need to be scanned (walked iteratively)
+    pending_dirs: List[str] = [dir_path]
 
-    Args:
-        files (FILE_INFOS): A list of file information.
+    while pending_dirs:
+        current_dir: str = pending_dirs.pop()
 
-    Returns:
-        FILE_INFOS: A list of files followed by directories.
+        # Get the list of files and directories in the current directory
+        with os.scandir(current_dir) as entries:
+            dirs: FILE_INFOS = list(entries)
 
-    """
-    files_list: os.DirEntry[str] = []
-    dirs_list: os.DirEntry[str] = []
+        for file in dirs:
+            is_directory: bool = file.is_dir()
 
-    # Separate files and directories
-    for file_info in files:
-        if file_info.is_dir():
-            dirs_list.append(file_info)
-        else:
-            files_list.append(file_info)
+            # Skip excluded directories
+            if is_directory and file.name in EXCLUDED_FILES:
+                continue
 
-    # Sort directories by length of 'root' (if it exists)
-    dirs_list.sort(key=lambda d: len(d.path), reverse=True)
+            # If it's a directory and recursive is True, scan the subdirectory
+            if is_directory and recursive:
+                # Scan the subdirectory later instead of recursing into it
+                pending_dirs.append(file.path)
 
-    # Return files followed by directories
-    return files_list + dirs_list
+            yield file
 
 
 def decode_file(
@@ -117,70 +94,134 @@ def decode_file(
     return (decrypted_modified_time, decrypted_extension, og_filename)
 
 
-def change_file_names(
-    files: FILE_INFOS,
-    decrypt_directory_name: bool = False,
-    use_index_filename: bool = False,
-) -> None:
+def decode_mtime(modified_time: str) -> int:
+    """
+    Decode the modified time of a file.
+
+    Args:
+        modified_time (str): The decrypted modified time.
+
+    Returns:
+        int: The modified time as a timestamp.
+
+    """
+    # files mounted by older versions stored the hexadecimal of the utf-8
+    # decimal string, one "3x" pair per digit: 14 characters or more for any
+    # timestamp of 7+ digits (from Jan 12 1970 on). new hex timestamps need
+    # 13 hex digits only after the year 8 million, so the cut-off is a length
+    # above 12 made of "3x" pairs. old values below 10^6 (the first 11 days
+    # of 1970) are read as hex and restore a wrong date: this is accepted, as
+    # the mounted names carry no format marker and no such files are expected
+    if len(modified_time) > 12 and is_legacy_mtime(modified_time):
+        return int(bytes.fromhex(modified_time).decode("utf8"))
+
+    return int(modified_time, 16)
+
+
+def is_legacy_mtime(modified_time: str) -> bool:
+    """
+    Check if the modified time uses the older (hex of decimal string) format.
+
+    Args:
+        modified_time (str): The decrypted modified time.
+
+    Returns:
+        bool: True if every byte is the hexadecimal of an ASCII digit.
+
+    """
+    if len(modified_time) % 2:
+        return False
+
+    return all(
+        modified_time[i] == "3" and modified_time[i + 1] in "0123456789"
+        for i in range(0, len(modified_time), 2)
+    )
+
+
+def iter_renames(
+    files: Iterable[os.DirEntry[str]], use_index_filename: bool = False
+) -> Iterator[Rename]:
+    """
+    Yield the rename of each file back to its original name and date.
+
+    Args:
+        files (Iterable[os.DirEntry[str]]): The mounted files.
+        use_index_filename (bool): Decrypt the filename if True.
+
+    Yields:
+        Rename: The rename to the original (unmounted) path.
+
+    """
     for file in files:
-        file_root = file.path.split("\\")[:-1]
-        file_root_dir = "\\".join(file_root)
+        # read the entry attributes once
+        path: str = file.path
 
-        is_file_dir = file.is_dir()
+        # skip the file if it no longer exists (already renamed or removed)
+        if not os.path.exists(path):
+            continue
+
+        is_file_dir: bool = file.is_dir()
+
+        file_root_dir = os.path.dirname(path)
 
         modified_time, extension, filename = decode_file(file.name, use_index_filename)
 
-        # since the modified_time encoded with utf-8,
-        # it need to be decoded first
-        modified_time = bytes.fromhex(modified_time).decode("utf8")
+        timestamp: int = decode_mtime(modified_time)
 
-        # https://stackoverflow.com/a/27549388/14182545
-        # change into windows modified time readable string
-        formatted_modified_time = datetime.fromtimestamp(int(modified_time)).strftime(
-            "%A, %B %d, %Y, %H:%M:%S"
-        )
+        file_extension: str = ""
 
-        """
-        Sometimes when changing the modified date of a file (filedate.File) the process
-        are preceded by os.rename and will print error :
+        if not is_file_dir and extension:
+            file_extension = "." + extension
 
-            FileNotFoundError: [WinError 2] The system cannot find the file specified:
+        if not filename and not use_index_filename:
+            filename = str(uuid4())
 
-        because the file already renamed before the filedate modify the file property (modified date)
+        new_filename = os.path.join(file_root_dir, filename + file_extension)
+
+        """
+        The modified date is changed by the rename hook, right before this
+        rename: renaming the content of a directory changes its modified date,
+        so the date of a directory set any earlier would be overwritten.
         """
-        try:
-            # change the current file modifed date to the new formatted modified date
-            filedate.File(file.path).set(modified=formatted_modified_time)
-            try:
-                file_extension: str = ""
+        yield Rename(
+            path,
+            new_filename,
+            # change the file modifed date back to the original modified date
+            partial(os.utime, path, (timestamp, timestamp)),
+        )
 
-                if not is_file_dir:
-                    file_extension = "." + extension
 
-                if not filename and not use_index_filename:
-                    filename = str(uuid4())
+def change_file_names(
+    files: Iterable[os.DirEntry[str]],
+    decrypt_directory_name: bool = False,
+    use_index_filename: bool = False,
+) -> None:
+    # directories are renamed after their content, so they are kept aside
+    dirs_buffer: FILE_INFOS = []
+
+    def only_files() -> Iterator[os.DirEntry[str]]:
+        for file in files:
+            if file.is_dir():
+                dirs_buffer.append(file)
+            else:
+                yield file
 
-                new_filename = "{dir_path}\\{filename}{extension}".format(
-                    dir_path=file_root_dir, filename=filename, extension=file_extension
-                )
+    # files are renamed while the next directories are still being scanned
+    rename_batch(iter_renames(only_files(), use_index_filename), ignore_errors=True)
 
-                os.rename(file.path, new_filename)
-            except Exception as ex:
-                print(ex)
-        except:
-            break
+    # then the directories one by one (deepest first)
+    dirs_buffer.sort(key=lambda d: len(d.path), reverse=True)
+
+    rename_batch(iter_renames(dirs_buffer, use_index_filename), ignore_errors=True)
 
 
 def change_root_directory_name(root_dir: str) -> None:
-    root_folder_path = "\\".join(root_dir.split("\\")[:-1])
-    root_folder_name = root_dir.split("\\")[-1]
+    root_folder_path = os.path.dirname(root_dir)
+    root_folder_name = os.path.basename(root_dir)
 
     _, _, dir_name = decode_file(root_folder_name)
 
-    new_root_directory_name = "{dir_path}\\{dir_name}".format(
-        dir_path=root_folder_path,
-        dir_name=dir_name,
-    )
+    new_root_directory_name = os.path.join(root_folder_path, dir_name)
 
     os.rename(root_dir, new_root_directory_name)
 
@@ -188,17 +229,17 @@ def change_root_directory_name(root_dir: str) -> None:
 def setup() -> List[str | bool]:
     global EXCLUDED_FILES, ALLOWED_SUFFIX
 
-    if args.exclude:
-        EXCLUDED_FILES = args.exclude
+    if options.exclude:
+        EXCLUDED_FILES = list(options.exclude)
 
-    if args.include:
-        ALLOWED_SUFFIX = tuple(list(ALLOWED_SUFFIX) + args.include)
+    if options.include:
+        ALLOWED_SUFFIX = ALLOWED_SUFFIX + options.include
 
-    root_directory: str = args.directory
+    root_directory: str = options.directory
 
-    use_index_filename: bool = args.use_index
-    hash_directory_name: bool = args.hash
-    recursive_directory: bool = args.recursive
+    use_index_filename: bool = options.use_index
+    hash_directory_name: bool = options.hash
+    recursive_directory: bool = options.recursive
 
     return [
         root_directory,
@@ -222,14 +263,14 @@ if __name__ == "__main__":
         use_index_filename,
     ) = setup()
 
-    files: FILE_INFOS = get_files(
+    files: Iterable[os.DirEntry[str]] = iter_files(
         cast(str, root_directory), cast(bool, recursive_directory)
     )
 
-    separted_file_dir = separate_file_and_directory(files)
-
     change_file_names(
-        files, cast(bool, decrypt_directory_name), cast(bool, use_index_filename)
+        files,
+        cast(bool, decrypt_directory_name),
+        cast(bool, use_index_filename),
     )
 
     if decrypt_directory_name:
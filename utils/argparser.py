@@ -1,4 +1,5 @@
 import argparse
+from typing import NamedTuple, Tuple
 
 
 def split_string(values):
@@ -53,3 +54,25 @@ parser.add_argument(
 )
 
 args = parser.parse_args()
+
+
+class Options(NamedTuple):
+    directory: str
+    recursive: bool
+    sort: bool
+    hash: bool
+    use_index: bool
+    include: Tuple[str, ...]
+    exclude: Tuple[str, ...]
+
+
+# immutable snapshot of the parsed arguments
+options = Options(
+    directory=args.directory,
+    recursive=args.recursive,
+    sort=args.sort,
+    hash=args.hash,
+    use_index=args.use_index,
+    include=tuple(args.include or ()),
+    exclude=tuple(args.exclude or ()),
+)
@@ -1,17 +1,14 @@
-import hashlib
+from utils.keystream import expand_key, xor_keystream
 
 def decrypt(key: str, ciphertext: str) -> str:
     # use SHA-256 to generate a hash of the key
-    hashed_key: bytes = hashlib.sha256(key.encode()).digest()
-
-    # convert the ciphertext from a string to a bytearray
-    byte_ciphertext: bytearray = bytearray.fromhex(ciphertext)
+    hashed_key: bytes = expand_key(key)
 
     # use XOR to decrypt the ciphertext
-    plaintext: str = ""
+    byte_plaintext: bytes = xor_keystream(hashed_key, bytes.fromhex(ciphertext))
 
-    for i in range(len(byte_ciphertext)):
-        plaintext += chr(byte_ciphertext[i] ^ hashed_key[i % len(hashed_key)])
+    # every byte is mapped to the code point of the same value
+    plaintext: str = byte_plaintext.decode("latin-1")
 
     # return the decrypted plaintext
     return plaintext
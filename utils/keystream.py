@@ -0,0 +1,46 @@
+import hashlib
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def expand_key(key: str) -> bytes:
+    """
+    Hash the key with SHA-256, the digest is used as the keystream block.
+
+    The same keys (key segment, modified time) are hashed several times per
+    file, so the digests are cached. Call `expand_key.cache_clear()` to drop
+    them in long-running processes.
+
+    Args:
+        key (str): The key to be hashed.
+
+    Returns:
+        bytes: The 32 bytes SHA-256 digest of the key.
+
+    """
+    # hashlib is backed by OpenSSL, which already uses the CPU SHA
+    # extensions (SHA-NI / ARMv8 SHA2) when they are available
+    return hashlib.sha256(key.encode()).digest()
+
+
+def xor_keystream(hashed_key: bytes, data: bytes) -> bytes:
+    """
+    XOR the data with the hashed key repeated over its whole length.
+
+    Args:
+        hashed_key (bytes): The key digest used as the keystream block.
+        data (bytes): The plaintext or ciphertext bytes.
+
+    Returns:
+        bytes: The XOR-ed bytes, same length as `data`.
+
+    """
+    size: int = len(data)
+
+    # repeat the hashed key until it covers the whole data
+    keystream: bytes = (hashed_key * (size // len(hashed_key) + 1))[:size]
+
+    # XOR every byte at once on big integers instead of one byte at a time
+    return (int.from_bytes(data, "big") ^ int.from_bytes(keystream, "big")).to_bytes(
+        size, "big"
+    )
@@ -0,0 +1,113 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from typing import Callable, Iterable, NamedTuple, Optional
+
+log = logging.getLogger(__name__)
+
+# errors skipped (logged) instead of raised when ignore_errors is True
+IGNORABLE_ERRORS = (FileNotFoundError, PermissionError)
+
+# renaming relative to an opened directory is not supported everywhere (Windows)
+SUPPORTS_DIR_FD: bool = os.rename in os.supports_dir_fd
+
+
+class Rename(NamedTuple):
+    old_path: str
+    new_path: str
+    # called right before this rename only, e.g. to set the modified date
+    # back (renaming the content of a directory changes its modified date)
+    before_rename: Optional[Callable[[], None]] = None
+
+
+def rename_batch(
+    renames: Iterable[Rename],
+    ignore_errors: bool = False,
+    max_workers: int = 1,
+) -> None:
+    """
+    Rename a batch of files, in the given order.
+
+    When supported, consecutive renames inside the same directory are done
+    relative to that directory opened once, so the kernel does not resolve
+    the whole path again for every file.
+
+    Args:
+        renames (Iterable[Rename]): The renames, each with its own hook.
+        ignore_errors (bool): Log renames of missing or locked files and keep
+            going if True.
+        max_workers (int): Rename the directories in parallel threads if
+            greater than 1, the order is then only kept inside a directory.
+
+    """
+    groups = groupby(renames, key=lambda rename: os.path.dirname(rename.old_path))
+
+    if max_workers <= 1:
+        for directory, group in groups:
+            _rename_group(directory, group, ignore_errors)
+
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_rename_group, directory, list(group), ignore_errors)
+            for directory, group in groups
+        ]
+
+    # raise the first error (if any) in the caller thread
+    for future in futures:
+        future.result()
+
+
+def _rename_group(
+    directory: str, renames: Iterable[Rename], ignore_errors: bool
+) -> None:
+    if not SUPPORTS_DIR_FD:
+        for rename in renames:
+            _rename(rename, None, ignore_errors)
+
+        return
+
+    try:
+        dir_fd: int = os.open(directory or ".", os.O_RDONLY | os.O_DIRECTORY)
+    except IGNORABLE_ERRORS as ex:
+        if not ignore_errors:
+            raise
+
+        log.warning(ex)
+        return
+
+    try:
+        for rename in renames:
+            _rename(rename, dir_fd, ignore_errors)
+    finally:
+        os.close(dir_fd)
+
+
+def _rename(rename: Rename, dir_fd: Optional[int], ignore_errors: bool) -> None:
+    old_path, new_path, before_rename = rename
+
+    # errors of the hook are not ignored, they stop the batch
+    if before_rename is not None:
+        before_rename()
+
+    try:
+        # the new name must stay in the same directory to use the opened one
+        if dir_fd is None or os.path.dirname(new_path) != os.path.dirname(old_path):
+            os.rename(old_path, new_path)
+        else:
+            os.rename(
+                os.path.basename(old_path),
+                os.path.basename(new_path),
+                src_dir_fd=dir_fd,
+                dst_dir_fd=dir_fd,
+            )
+    except OSError as ex:
+        # report the full paths rather than the names relative to the directory
+        ex.filename, ex.filename2 = old_path, new_path
+
+        if not ignore_errors or not isinstance(ex, IGNORABLE_ERRORS):
+            raise
+
+        log.warning(ex)